@@ -1,28 +1,28 @@
 from utils import get_logger
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.linkgraph import LinkGraph
+from crawler.pool import WorkerPool
 from scraper import Scraper
 
 class Crawler(object):
-    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker, scraper_factory=Scraper):
+    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker, scraper_factory=Scraper, linkgraph_factory=LinkGraph):
         self.config = config
         self.logger = get_logger("CRAWLER")
         self.frontier = frontier_factory(config, restart)
-        self.workers = list()
+        self.pool = None
         self.worker_factory = worker_factory
         self.scraper = scraper_factory(restart, self.frontier)
+        self.linkgraph = linkgraph_factory(restart)
 
     def start_async(self):
-        self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier, self.scraper)
-            for worker_id in range(self.config.threads_count)]
-        for worker in self.workers:
-            worker.start()
+        self.pool = WorkerPool(self.config, self.frontier, self.worker_factory, (self.scraper, self.linkgraph))
+        self.pool.start()
 
     def start(self):
         self.start_async()
         self.join()
 
     def join(self):
-        for worker in self.workers:
-            worker.join()
+        self.pool.join()
+        self.linkgraph.close()
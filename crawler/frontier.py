@@ -1,7 +1,7 @@
 import os
 import shelve
 
-from threading import Thread, RLock
+from threading import Thread, RLock, Condition
 from queue import Queue, Empty
 from collections import defaultdict
 from urllib.parse import urlparse, urlunparse
@@ -47,6 +47,12 @@ class Frontier(object):
         self.tbd_count_lock = RLock()
         self.add_lock = RLock()
         self.pop_lock = RLock()
+
+        # Number of URLs handed to workers that have not been finished yet. The crawl is only over when
+        #   the queues are empty and nothing is in flight, since an in-flight page can still add new URLs.
+        #   Idle workers wait on fetch_lock until a URL is added, a fetch finishes, or a queue becomes polite again.
+        self.in_flight = 0
+        self.fetch_lock = Condition(RLock())
         self.query_counts = defaultdict(int)
         self.query_counts_file = query_counts_file
         self.query_limit = query_limit
@@ -111,6 +117,69 @@ class Frontier(object):
             count += queue.qsize()
         return count
 
+    def get_in_flight_count(self):
+        self.fetch_lock.acquire()
+        try:
+            return self.in_flight
+        finally:
+            self.fetch_lock.release()
+
+    def get_active_queue_count(self):
+        '''
+        Number of politeness queues that have URLs waiting. Each one can hand out one URL per time delay.
+        '''
+        count = 0
+        for queue in self.tbd:
+            if queue.qsize() > 0:
+                count += 1
+        return count
+
+    def get_next_ready_delay(self):
+        '''
+        Seconds until the next queue with URLs waiting is allowed to hand one out, or the time delay if every queue is empty.
+        '''
+        now = time.time()
+        delay = self.config.time_delay
+        for queue, timestamp in zip(self.tbd, self.queue_timestamps):
+            if queue.qsize() > 0:
+                delay = min(delay, self.config.time_delay - (now - timestamp))
+        return max(delay, 0)
+
+    def is_finished(self):
+        '''
+        The crawl is finished when there are no URLs to be downloaded and no URLs being downloaded.
+        '''
+        self.fetch_lock.acquire()
+        try:
+            return self.in_flight == 0 and self.get_tbd_count() <= 0
+        finally:
+            self.fetch_lock.release()
+
+    def wait_for_url(self):
+        '''
+        Block until a URL might be available: a URL was added to an empty queue, the crawl finished, or a queue became polite again.
+        '''
+        self.fetch_lock.acquire()
+        try:
+            if not self.is_finished():
+                self.fetch_lock.wait(self.get_next_ready_delay())
+        finally:
+            self.fetch_lock.release()
+
+    def finish_url(self, url):
+        '''
+        Called by a worker once it is done with a URL returned by get_tbd_url, after adding the URLs scraped from it.
+        '''
+        self.fetch_lock.acquire()
+        try:
+            self.in_flight -= 1
+            # URLs scraped from this page already woke a worker when they were added, so only the
+            #   end of the crawl has to wake everyone
+            if self.is_finished():
+                self.fetch_lock.notify_all()
+        finally:
+            self.fetch_lock.release()
+
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
@@ -146,7 +215,12 @@ class Frontier(object):
                     print(f'taking from queue {self.next_tbd}')
                     self.decrement_tbd()
                     self.queue_timestamps[self.next_tbd] = time.time()
-                    ret = self.tbd[self.next_tbd].get()
+                    self.fetch_lock.acquire()
+                    try:
+                        ret = self.tbd[self.next_tbd].get()
+                        self.in_flight += 1
+                    finally:
+                        self.fetch_lock.release()
                     # print(f'ret: {ret}')
                     # self.logger.info(
                     #     f'Popped {ret} from queue #{self.next_tbd}.'
@@ -181,6 +255,15 @@ class Frontier(object):
             self.pop_lock.release()
 
     def add_url(self, url):
+        # Checking the save file and adding the URL to a queue happen under one lock, so that two workers
+        #   can't both add the same URL, and the shelves are never read while another thread writes them.
+        self.add_lock.acquire()
+        try:
+            self._add_url(url)
+        finally:
+            self.add_lock.release()
+
+    def _add_url(self, url):
         url = normalize(url)
         urlhash = get_urlhash(url)
             
@@ -244,7 +327,9 @@ class Frontier(object):
         self.add_lock.acquire()
 
         try:
-            self.tbd[domain_hash % self.queue_count].put(url)
+            queue = self.tbd[domain_hash % self.queue_count]
+            was_empty = queue.qsize() == 0
+            queue.put(url)
             self.increment_tbd()
             self.save[urlhash] = (url, False)
             self.save.sync()
@@ -252,17 +337,33 @@ class Frontier(object):
             # self.logger.info(f'Added {url} to frontier.')
         finally:
             self.add_lock.release()
+
+        # Only a queue that was empty can give an idle worker something new to do
+        if was_empty:
+            self.fetch_lock.acquire()
+            try:
+                self.fetch_lock.notify()
+            finally:
+                self.fetch_lock.release()
     
     def is_crawled(self, url):
         urlhash = get_urlhash(url)
-        return (urlhash in self.save and self.save[urlhash][1])
+        self.add_lock.acquire()
+        try:
+            return (urlhash in self.save and self.save[urlhash][1])
+        finally:
+            self.add_lock.release()
     
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        self.add_lock.acquire()
+        try:
+            if urlhash not in self.save:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+            self.save[urlhash] = (url, True)
+            self.save.sync()
+        finally:
+            self.add_lock.release()
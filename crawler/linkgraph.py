@@ -0,0 +1,346 @@
+import os
+import shutil
+
+from threading import RLock
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils import get_logger, normalize
+
+
+# ---- link graph ----
+# every page the workers download gives us a set of edges (page -> outlinks). These are recorded
+#   in two append-only files so that recording stays cheap while crawling:
+#       urls.txt   : one URL per line, the line number (starting at 0) is the URL's integer ID
+#       edges.bin  : pairs of little-endian int32 IDs (src, dst)
+#       crawled.bin: little-endian int32 IDs of pages that were crawled, including pages without outlinks
+# after (or during) a crawl the edge log is compacted into CSR arrays that are saved as .npy files,
+#   which can be memory mapped so that graphs with millions of edges don't need to be loaded into memory:
+#       indptr.npy  : int64, length n + 1, out-edges of node i are indices[indptr[i]:indptr[i + 1]]
+#       indices.npy : int32, destination IDs, sorted by source ID
+#       crawled.npy : bool, length n, whether each page was crawled
+# duplicate edges and self loops are dropped during compaction.
+
+EDGE_DTYPE = np.dtype('<i4')
+
+
+class LinkGraph:
+    def __init__(self, restart, graph_dir='linkgraph', urls_file='urls.txt', edges_file='edges.bin', crawled_file='crawled.bin'):
+        self.logger = get_logger("LINKGRAPH")
+        self.graph_dir = graph_dir
+        self.urls_path = os.path.join(graph_dir, urls_file)
+        self.edges_path = os.path.join(graph_dir, edges_file)
+        self.crawled_path = os.path.join(graph_dir, crawled_file)
+        if os.path.exists(graph_dir) and restart:
+            self.logger.info(
+                f"Found link graph directory {graph_dir}, deleting it.")
+            shutil.rmtree(graph_dir)
+        if not os.path.exists(graph_dir):
+            os.makedirs(graph_dir)
+        self.lock = RLock()
+
+        # URL IDs are stored in the format: {URL: ID}
+        self.ids = dict()
+        self.urls = list()
+        if os.path.exists(self.urls_path):
+            with open(self.urls_path, mode='r', encoding='utf-8') as file:
+                for line in file:
+                    # a line without a newline was only partially written before a crash
+                    if line.endswith('\n'):
+                        self._remember(line[:-1])
+            self.logger.info(
+                f"Loaded {len(self.urls)} link graph nodes from {self.urls_path}.")
+        # rewrite the URL file so that a partially written last line is not appended to
+        with open(self.urls_path, mode='w', encoding='utf-8') as file:
+            file.writelines(f'{url}\n' for url in self.urls)
+        _truncate_log(self.edges_path, 2 * EDGE_DTYPE.itemsize)
+        _truncate_log(self.crawled_path, EDGE_DTYPE.itemsize)
+
+        self.urls_file = open(self.urls_path, mode='a', encoding='utf-8')
+        self.edges_file = open(self.edges_path, mode='ab')
+        self.crawled_file = open(self.crawled_path, mode='ab')
+
+    def _remember(self, url):
+        self.ids[url] = len(self.urls)
+        self.urls.append(url)
+
+    def get_id(self, url):
+        '''
+        Get the integer ID of a URL, assigning it the next ID if it has not been seen before.
+        '''
+        url = normalize(url)
+        self.lock.acquire()
+        try:
+            if url not in self.ids:
+                self._remember(url)
+                self.urls_file.write(f'{url}\n')
+            return self.ids[url]
+        finally:
+            self.lock.release()
+
+    def add_edges(self, url, outlinks):
+        '''
+        Record url as crawled and append an edge from url to every URL in outlinks to the edge log.
+        Called for every downloaded page, even when outlinks is empty.
+        '''
+        self.lock.acquire()
+        try:
+            src = self.get_id(url)
+            edges = np.empty((len(outlinks), 2), dtype=EDGE_DTYPE)
+            edges[:, 0] = src
+            for i, outlink in enumerate(outlinks):
+                edges[i, 1] = self.get_id(outlink)
+            # URLs have to be on disk before any edge that refers to them
+            self.urls_file.flush()
+            np.array([src], dtype=EDGE_DTYPE).tofile(self.crawled_file)
+            self.crawled_file.flush()
+            edges.tofile(self.edges_file)
+            self.edges_file.flush()
+        finally:
+            self.lock.release()
+
+    def compact(self):
+        '''
+        Compact the edge log into CSR arrays saved in the graph directory and return them as a CSRGraph.
+        '''
+        self.lock.acquire()
+        try:
+            self.urls_file.flush()
+            self.edges_file.flush()
+            self.crawled_file.flush()
+            return compact(self.graph_dir, self.edges_path, self.crawled_path, len(self.urls))
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            self.urls_file.close()
+            self.edges_file.close()
+            self.crawled_file.close()
+        finally:
+            self.lock.release()
+
+
+def _truncate_log(path, record_size):
+    '''
+    Drop a partially written record at the end of a log.
+    '''
+    if os.path.exists(path):
+        size = os.path.getsize(path)
+        if size % record_size:
+            with open(path, mode='r+b') as file:
+                file.truncate(size - size % record_size)
+
+
+def compact(graph_dir, edges_path, crawled_path, node_count):
+    '''
+    Read the edge log at edges_path and the crawled log at crawled_path, and save them as CSR arrays
+    (indptr.npy, indices.npy) and a crawled bitmap (crawled.npy) in graph_dir.
+    '''
+    edges = np.fromfile(edges_path, dtype=EDGE_DTYPE)
+    edges = edges[:len(edges) - len(edges) % 2].reshape(-1, 2)
+    src = edges[:, 0].astype(np.int64)
+    dst = edges[:, 1].astype(np.int64)
+    del edges
+
+    # sorting the combined key both orders edges by source and lets np.unique drop duplicates
+    stride = max(node_count, 1)
+    keys = src * stride + dst
+    keys = np.unique(keys[src != dst])
+    del src, dst
+    src = keys // stride
+    indices = (keys % stride).astype(np.int32)
+    del keys
+
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=node_count), out=indptr[1:])
+    np.save(os.path.join(graph_dir, 'indptr.npy'), indptr)
+    np.save(os.path.join(graph_dir, 'indices.npy'), indices)
+
+    crawled = np.zeros(node_count, dtype=bool)
+    if os.path.exists(crawled_path):
+        crawled_ids = np.fromfile(crawled_path, dtype=EDGE_DTYPE)
+        crawled[crawled_ids[crawled_ids < node_count]] = True
+    np.save(os.path.join(graph_dir, 'crawled.npy'), crawled)
+    return CSRGraph(indptr, indices, crawled)
+
+
+class CSRGraph:
+    def __init__(self, indptr, indices, crawled=None):
+        # crawled: bitmap of crawled pages. Without one, pages with outlinks are treated as crawled.
+        self.indptr = indptr
+        self.indices = indices
+        self.crawled = crawled
+        self.node_count = len(indptr) - 1
+        self.edge_count = len(indices)
+
+    @classmethod
+    def load(cls, graph_dir='linkgraph', mmap_mode='r'):
+        '''
+        Load the CSR arrays written by compact(), memory mapped by default.
+        '''
+        indptr = np.load(os.path.join(graph_dir, 'indptr.npy'), mmap_mode=mmap_mode)
+        indices = np.load(os.path.join(graph_dir, 'indices.npy'), mmap_mode=mmap_mode)
+        crawled = None
+        if os.path.exists(os.path.join(graph_dir, 'crawled.npy')):
+            crawled = np.load(os.path.join(graph_dir, 'crawled.npy'), mmap_mode=mmap_mode)
+        return cls(indptr, indices, crawled)
+
+    def sources(self):
+        '''
+        Source ID of every edge, aligned with indices.
+        '''
+        return np.repeat(np.arange(self.node_count, dtype=np.int32), self.out_degree())
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=self.node_count)
+
+    def pagerank(self, damping=0.85, tol=1e-8, max_iter=100):
+        '''
+        Compute PageRank with power iteration. Rank held by pages without outlinks is spread evenly
+        over every page. Iteration stops once the L1 change between iterations drops below tol.
+        '''
+        n = self.node_count
+        if n == 0:
+            return np.zeros(0)
+        src = self.sources()
+        dst = self.indices
+        out_degree = self.out_degree()
+        dangling = out_degree == 0
+        inv_out_degree = np.zeros(n)
+        inv_out_degree[~dangling] = 1.0 / out_degree[~dangling]
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            share = rank * inv_out_degree
+            new_rank = damping * np.bincount(dst, weights=share[src], minlength=n)
+            new_rank += (1.0 - damping + damping * rank[dangling].sum()) / n
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tol:
+                break
+        return rank
+
+    def strongly_connected_components(self):
+        '''
+        Label every node with the number of its strongly connected component. Uses scipy's linear time
+        implementation directly on the CSR arrays.
+        '''
+        return strong_components(self.indptr, self.indices)
+
+    def trap_clusters(self, min_size=2, max_exit_fraction=0.25, seeds=None):
+        '''
+        Find clusters of crawled pages that mostly link to each other, which is what calendars, paginated
+        archives and other generated pages look like.
+        Only links between crawled pages are used, including links to crawled pages without outlinks.
+        Links to pages that were discovered but never crawled are ignored, since a trap the crawler is still
+        inside always links to pages it has not crawled yet.
+        Links into the seed pages (node IDs, by default the page with the highest in-degree) are ignored too.
+        Every page's navigation links back to the home page would otherwise put the whole site, and any
+        calendar or archive in it, into one big component. Other navigation hubs can be passed in seeds as well.
+        A chain of pages that only link forward (e.g. "next month") is not a cluster, only pages that also
+        link back to each other are.
+        A cluster is a strongly connected component of the crawled pages with at least min_size pages. Its
+        exit fraction is the share of its links (to crawled pages) that leave the cluster. A fraction of 0
+        means the cluster is closed.
+        Returns a list of (node IDs, exit fraction) for clusters with an exit fraction of at most
+        max_exit_fraction, lowest exit fraction first, then largest first.
+        '''
+        crawled = self.crawled if self.crawled is not None else self.out_degree() > 0
+        crawled = np.asarray(crawled, dtype=bool)
+        if seeds is None:
+            seeds = [np.argmax(self.in_degree())] if self.node_count else []
+        is_seed = np.zeros(self.node_count, dtype=bool)
+        is_seed[np.asarray(seeds, dtype=np.int64)] = True
+        src = self.sources()
+        dst = np.asarray(self.indices)
+        keep = crawled[src] & crawled[dst] & ~is_seed[dst]
+        src = src[keep]
+        dst = dst[keep]
+        # edges stay sorted by source after filtering, so they are still a valid CSR graph
+        indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.node_count), out=indptr[1:])
+        labels = strong_components(indptr, dst)
+
+        component_count = labels.max() + 1 if len(labels) else 0
+        sizes = np.bincount(labels[crawled], minlength=component_count)
+        links = np.bincount(labels[src], minlength=component_count)
+        leaving = labels[src] != labels[dst]
+        exits = np.bincount(labels[src[leaving]], minlength=component_count)
+        exit_fraction = exits / np.maximum(links, 1)
+
+        traps = np.flatnonzero((sizes >= min_size) & (exit_fraction <= max_exit_fraction))
+        traps = traps[np.lexsort((-sizes[traps], exit_fraction[traps]))]
+        members = np.flatnonzero(crawled)
+        members = members[np.argsort(labels[members], kind='stable')]
+        bounds = np.searchsorted(labels[members], traps)
+        return [(members[start:start + sizes[trap]], exit_fraction[trap]) for start, trap in zip(bounds, traps)]
+
+
+def strong_components(indptr, indices):
+    '''
+    Label every node of the CSR graph (indptr, indices) with the number of its strongly connected component.
+    '''
+    node_count = len(indptr) - 1
+    matrix = csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=(node_count, node_count))
+    _, labels = connected_components(matrix, directed=True, connection='strong')
+    return labels
+
+
+def load_urls(graph_dir='linkgraph', urls_file='urls.txt'):
+    '''
+    Load the list of URLs, indexed by ID.
+    '''
+    with open(os.path.join(graph_dir, urls_file), mode='r', encoding='utf-8') as file:
+        return [line[:-1] for line in file if line.endswith('\n')]
+
+
+def export_scores(path, urls, graph, rank=None):
+    '''
+    Write each URL's PageRank, in-degree and out-degree to path as tab separated values, highest PageRank first.
+    '''
+    if rank is None:
+        rank = graph.pagerank()
+    in_degree = graph.in_degree()
+    out_degree = graph.out_degree()
+    with open(path, mode='w', encoding='utf-8') as file:
+        for i in np.argsort(-rank, kind='stable'):
+            file.write(f'{urls[i]}\t{rank[i]:.10g}\t{in_degree[i]}\t{out_degree[i]}\n')
+
+
+def load_scores(path):
+    '''
+    Load the PageRank scores written by export_scores() in the format: {URL: PageRank}.
+    Can be used to order URLs in the frontier.
+    '''
+    scores = dict()
+    with open(path, mode='r', encoding='utf-8') as file:
+        for line in file:
+            url, rank, _, _ = line.rstrip('\n').split('\t')
+            scores[url] = float(rank)
+    return scores
+
+
+def analyze(seed_urls, graph_dir='linkgraph', scores_file='pagerank.txt', traps_file='trapclusters.txt'):
+    '''
+    Compact the link graph recorded by a crawl, then write PageRank scores to scores_file and trap clusters to traps_file.
+    '''
+    urls = load_urls(graph_dir)
+    graph = compact(graph_dir, os.path.join(graph_dir, 'edges.bin'), os.path.join(graph_dir, 'crawled.bin'), len(urls))
+    print(f'{graph.node_count} pages, {graph.edge_count} links')
+    rank = graph.pagerank()
+    export_scores(scores_file, urls, graph, rank)
+
+    ids = {url: i for i, url in enumerate(urls)}
+    seeds = [ids[normalize(url)] for url in seed_urls if normalize(url) in ids]
+    with open(traps_file, mode='w') as file:
+        for cluster, exit_fraction in graph.trap_clusters(seeds=seeds or None):
+            file.write(f'{len(cluster)} pages, {exit_fraction:.1%} of links leave the cluster\n')
+            for i in cluster:
+                file.write(f'    {urls[i]}\n')
@@ -0,0 +1,106 @@
+import math
+import time
+
+from threading import Thread, RLock
+
+from utils import get_logger
+
+
+class WorkerPool(Thread):
+    def __init__(self, config, frontier, worker_factory, worker_args=(), latency_weight=0.2):
+        # Additional attributes:
+        #   worker_args: extra arguments passed to worker_factory after (worker_id, config, frontier)
+        #   latency_weight: weight of the newest fetch in the moving average of fetch latency
+        # Every scale interval the pool sizes itself to the number of fetches that can be in flight at once.
+        #   Each politeness queue with URLs waiting hands out one URL per time delay, and each fetch keeps a
+        #   worker busy for the fetch latency, so (by Little's law) the number of busy workers needed is
+        #       active queues * latency / time delay
+        #   which is clamped to the min and max thread counts in config.ini.
+        self.logger = get_logger("POOL")
+        self.config = config
+        self.frontier = frontier
+        self.worker_factory = worker_factory
+        self.worker_args = worker_args
+        self.latency_weight = latency_weight
+        self.latency = config.time_delay
+        self.workers = list()
+        self.target = min(max(config.threads_count, config.min_threads), config.max_threads)
+        self.next_worker_id = 0
+        self.lock = RLock()
+        super().__init__(daemon=True)
+
+    def record_latency(self, latency):
+        self.lock.acquire()
+        try:
+            self.latency += self.latency_weight * (latency - self.latency)
+        finally:
+            self.lock.release()
+
+    def should_retire(self, worker):
+        '''
+        Called by a worker between fetches. Returns True (and forgets the worker) if the pool has more workers than it needs.
+        '''
+        self.lock.acquire()
+        try:
+            self.workers = [w for w in self.workers if w.is_alive()]
+            if len(self.workers) > self.target and worker in self.workers:
+                self.workers.remove(worker)
+                return True
+            return False
+        finally:
+            self.lock.release()
+
+    def get_target(self):
+        if self.config.time_delay <= 0:
+            return self.config.max_threads
+        needed = math.ceil(self.frontier.get_active_queue_count() * self.latency / self.config.time_delay)
+        return min(max(needed, self.config.min_threads, 1), self.config.max_threads)
+
+    def resize(self):
+        self.lock.acquire()
+        try:
+            # workers that stopped on their own are no longer part of the pool
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            target = self.get_target()
+            if target != self.target:
+                self.logger.info(
+                    f"Resizing worker pool from {self.target} to {target} workers "
+                    f"(latency {self.latency:.3f}s, {self.frontier.get_in_flight_count()} in flight).")
+                self.target = target
+            self._fill()
+        finally:
+            self.lock.release()
+
+    def _fill(self):
+        '''
+        Start workers until the pool reaches its target size. Extra workers retire themselves in should_retire.
+        '''
+        self.lock.acquire()
+        try:
+            while len(self.workers) < self.target:
+                worker = self.worker_factory(self.next_worker_id, self.config, self.frontier, *self.worker_args)
+                # set as an attribute so that worker factories don't need to accept the pool
+                worker.pool = self
+                self.next_worker_id += 1
+                self.workers.append(worker)
+                worker.start()
+        finally:
+            self.lock.release()
+
+    def run(self):
+        # start with THREADCOUNT workers until there is a fetch latency to size the pool with
+        self._fill()
+        while not self.frontier.is_finished():
+            time.sleep(self.config.scale_interval)
+            self.resize()
+        self.logger.info("Frontier is empty and nothing is in flight. Stopping worker pool.")
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        self.lock.acquire()
+        try:
+            workers = list(self.workers)
+        finally:
+            self.lock.release()
+        for worker in workers:
+            worker.join()
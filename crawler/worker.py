@@ -8,11 +8,14 @@ import time
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier, scrap):
+    def __init__(self, worker_id, config, frontier, scrap, linkgraph=None):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
         self.scraper = scrap
+        self.linkgraph = linkgraph
+        # set by the WorkerPool that started this worker
+        self.pool = None
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -20,22 +23,33 @@ class Worker(Thread):
         
     def run(self):
         while True:
+            if self.pool is not None and self.pool.should_retire(self):
+                self.logger.info("Worker pool is shrinking. Stopping worker.")
+                break
             tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
-                if self.frontier.get_tbd_count() <= 0:
+                if self.frontier.is_finished():
                     self.logger.info("Frontier is empty. Stopping Crawler.")
                     break
                 else:
-                    self.logger.info("Frontier did not return URL, but still has URLs.")
+                    self.logger.info("Frontier did not return URL, but still has URLs or URLs in flight.")
                     print(f'# of urls: {self.frontier.get_tbd_count()}')
-                    time.sleep(self.config.time_delay)
+                    self.frontier.wait_for_url()
             else:
-                resp = download(tbd_url, self.config, self.logger)
-                self.logger.info(
-                    f"Downloaded {tbd_url}, status <{resp.status}>, "
-                    f"using cache {self.config.cache_server}.")
-                scraped_urls = self.scraper.scraper(tbd_url, resp)
-                for scraped_url in scraped_urls:
-                    self.frontier.add_url(scraped_url)
-                self.frontier.mark_url_complete(tbd_url)
+                try:
+                    start = time.time()
+                    resp = download(tbd_url, self.config, self.logger)
+                    if self.pool is not None:
+                        self.pool.record_latency(time.time() - start)
+                    self.logger.info(
+                        f"Downloaded {tbd_url}, status <{resp.status}>, "
+                        f"using cache {self.config.cache_server}.")
+                    scraped_urls = self.scraper.scraper(tbd_url, resp)
+                    if self.linkgraph is not None:
+                        self.linkgraph.add_edges(tbd_url, scraped_urls)
+                    for scraped_url in scraped_urls:
+                        self.frontier.add_url(scraped_url)
+                    self.frontier.mark_url_complete(tbd_url)
+                finally:
+                    self.frontier.finish_url(tbd_url)
                 #time.sleep(self.config.time_delay)
@@ -4,12 +4,16 @@ from argparse import ArgumentParser
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.linkgraph import analyze
 
 
-def main(config_file, restart):
+def main(config_file, restart, analyze_graph):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    if analyze_graph:
+        analyze(config.seed_urls)
+        return
     config.cache_server = get_cache_server(config, restart)
     crawler = Crawler(config, restart)
     crawler.start()
@@ -19,5 +23,6 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--analyze", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.analyze)
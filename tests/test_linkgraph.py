@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pytest
+
+from crawler.linkgraph import CSRGraph, EDGE_DTYPE, LinkGraph, compact, export_scores, load_scores, load_urls
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # LinkGraph and its logger write into the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def make_graph(node_count, edges, crawled=None):
+    '''
+    Write edges to an edge log and compact it. Pages with outlinks are crawled unless crawled is given.
+    '''
+    if crawled is None:
+        crawled = sorted({src for src, _ in edges})
+    os.makedirs('linkgraph', exist_ok=True)
+    np.array(edges, dtype=EDGE_DTYPE).reshape(-1, 2).tofile(os.path.join('linkgraph', 'edges.bin'))
+    np.array(crawled, dtype=EDGE_DTYPE).tofile(os.path.join('linkgraph', 'crawled.bin'))
+    return compact('linkgraph', os.path.join('linkgraph', 'edges.bin'), os.path.join('linkgraph', 'crawled.bin'), node_count)
+
+
+def test_add_edges_and_compact():
+    linkgraph = LinkGraph(True)
+    linkgraph.add_edges('a', ['b', 'c', 'b', 'a'])
+    linkgraph.add_edges('b/', ['a'])
+    linkgraph.add_edges('c', [])
+    graph = linkgraph.compact()
+    linkgraph.close()
+    assert load_urls() == ['a', 'b', 'c']
+    # duplicate edges and self loops are dropped, URLs are normalized
+    assert graph.indptr.tolist() == [0, 2, 3, 3]
+    assert graph.indices.tolist() == [1, 2, 0]
+    assert graph.crawled.tolist() == [True, True, True]
+
+    loaded = CSRGraph.load()
+    assert loaded.indptr.tolist() == graph.indptr.tolist()
+    assert loaded.indices.tolist() == graph.indices.tolist()
+    assert loaded.crawled.tolist() == graph.crawled.tolist()
+
+
+def test_resume_recovers_truncated_logs():
+    linkgraph = LinkGraph(True)
+    linkgraph.add_edges('a', ['b'])
+    linkgraph.close()
+    # a crash in the middle of writing a URL, an edge and a crawled ID
+    with open(os.path.join('linkgraph', 'urls.txt'), mode='a') as file:
+        file.write('partial')
+    with open(os.path.join('linkgraph', 'edges.bin'), mode='ab') as file:
+        file.write(b'\x01\x00\x00')
+    with open(os.path.join('linkgraph', 'crawled.bin'), mode='ab') as file:
+        file.write(b'\x01')
+
+    linkgraph = LinkGraph(False)
+    linkgraph.add_edges('b', ['c'])
+    graph = linkgraph.compact()
+    linkgraph.close()
+    assert load_urls() == ['a', 'b', 'c']
+    assert graph.indptr.tolist() == [0, 1, 2, 2]
+    assert graph.indices.tolist() == [1, 2]
+    assert graph.crawled.tolist() == [True, True, False]
+
+
+def test_pagerank():
+    # 3 has no outlinks, so its rank is spread over every page
+    graph = make_graph(4, [(0, 1), (1, 2), (2, 0), (2, 3)])
+    rank = graph.pagerank()
+    assert rank.sum() == pytest.approx(1)
+
+    # solve rank = (1 - d) / n + d * M @ rank directly
+    damping = 0.85
+    matrix = np.zeros((4, 4))
+    for src, dst in [(0, 1), (1, 2), (2, 0), (2, 3)]:
+        matrix[dst, src] = 1
+    matrix[:, 3] = 1
+    matrix /= matrix.sum(axis=0)
+    expected = np.linalg.solve(np.eye(4) - damping * matrix, np.full(4, (1 - damping) / 4))
+    assert rank == pytest.approx(expected, abs=1e-6)
+
+    # a single page without outlinks keeps all the rank
+    rank = make_graph(1, []).pagerank()
+    assert rank.tolist() == pytest.approx([1])
+
+
+def test_export_and_load_scores():
+    graph = make_graph(3, [(0, 1), (1, 0), (2, 0)])
+    urls = ['a', 'b', 'c']
+    rank = graph.pagerank()
+    export_scores('pagerank.txt', urls, graph, rank)
+    scores = load_scores('pagerank.txt')
+    assert list(scores) == ['a', 'b', 'c']
+    for i, url in enumerate(urls):
+        assert scores[url] == pytest.approx(rank[i])
+
+
+def test_scc_backward_chain():
+    # an archive where every post links to the previous one
+    n = 200000
+    graph = make_graph(n, [(i, i - 1) for i in range(1, n)])
+    labels = graph.strongly_connected_components()
+    assert len(np.unique(labels)) == n
+
+
+def test_scc_cycles():
+    graph = make_graph(6, [(0, 1), (1, 0), (0, 2), (2, 3), (3, 4), (4, 2), (5, 0)])
+    labels = graph.strongly_connected_components()
+    assert labels[0] == labels[1]
+    assert labels[2] == labels[3] == labels[4]
+    assert len(np.unique(labels)) == 3
+
+
+def test_trap_clusters_ignore_uncrawled_pages():
+    # 0 <-> 1 is the site, 2 -> 3 -> 4 -> 2 is a trap still linking to uncrawled pages 5 and 6
+    graph = make_graph(7, [(0, 1), (1, 0), (1, 2), (2, 3), (3, 4), (4, 2), (2, 5), (4, 6)], crawled=[0, 1, 2, 3, 4])
+    clusters = graph.trap_clusters(max_exit_fraction=1, seeds=[0])
+    assert len(clusters) == 1
+    members, exit_fraction = clusters[0]
+    assert sorted(members) == [2, 3, 4]
+    assert exit_fraction == 0
+
+
+def test_trap_clusters_count_links_to_crawled_leaf_pages():
+    # a <-> b, and b links to c, which was crawled but has no outlinks
+    graph = make_graph(3, [(0, 1), (1, 0), (1, 2)], crawled=[0, 1, 2])
+    assert graph.trap_clusters(seeds=[]) == []
+
+
+def site_with_calendar(calendar_edges):
+    # home page 0 <-> sections 1-3, a calendar 3 -> 4 -> 5 -> 6 -> 7 where every page links back to
+    #   the home page, and 7 links to the uncrawled page 8
+    edges = [(0, 1), (1, 0), (0, 2), (2, 0), (0, 3), (3, 0), (3, 4)]
+    edges += [(page, 0) for page in range(4, 8)]
+    edges += calendar_edges + [(7, 8)]
+    return make_graph(9, edges)
+
+
+def test_trap_clusters_ignore_navigation_links_to_home_page():
+    graph = site_with_calendar([(4, 5), (5, 6), (6, 7)])
+    assert graph.trap_clusters(max_exit_fraction=1) == []
+
+
+def test_trap_clusters_find_calendar_inside_site():
+    graph = site_with_calendar([(4, 5), (5, 4), (5, 6), (6, 5), (6, 7), (7, 6)])
+    clusters = graph.trap_clusters()
+    assert len(clusters) == 1
+    members, exit_fraction = clusters[0]
+    assert sorted(members) == [4, 5, 6, 7]
+    assert exit_fraction == 0
+    members, _ = graph.trap_clusters(seeds=[0])[0]
+    assert sorted(members) == [4, 5, 6, 7]
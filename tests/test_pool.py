@@ -0,0 +1,151 @@
+import time
+
+from threading import Event, Thread
+from types import SimpleNamespace
+
+import pytest
+
+import crawler.worker
+from crawler.frontier import Frontier
+from crawler.pool import WorkerPool
+from crawler.worker import Worker
+
+
+SEED = 'https://www.ics.uci.edu/seed'
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # the frontier's shelves and the loggers write into the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def close_frontier(frontier):
+    # shelves left open are written when garbage collected, after the working directory is restored
+    frontier.save.close()
+    frontier.query_counts_shelve.close()
+
+
+def make_config(**kwargs):
+    config = SimpleNamespace(
+        save_file='frontier.shelve', seed_urls=[SEED], time_delay=0.01, cache_server=None,
+        threads_count=3, min_threads=3, max_threads=3, scale_interval=0.05)
+    config.__dict__.update(kwargs)
+    return config
+
+
+def test_frontier_finishes_when_queues_empty_and_nothing_in_flight():
+    frontier = Frontier(make_config(), True)
+    assert not frontier.is_finished()
+
+    url = frontier.get_tbd_url()
+    assert url == SEED
+    assert frontier.get_tbd_count() == 0
+    assert frontier.get_in_flight_count() == 1
+    assert not frontier.is_finished()
+
+    frontier.add_url('https://www.ics.uci.edu/next')
+    frontier.finish_url(url)
+    assert not frontier.is_finished()
+
+    time.sleep(0.02)
+    url = frontier.get_tbd_url()
+    assert url == 'https://www.ics.uci.edu/next'
+    frontier.finish_url(url)
+    assert frontier.is_finished()
+    close_frontier(frontier)
+
+
+def test_page_in_flight_keeps_idle_workers_alive(monkeypatch):
+    fetched = list()
+    workers_alive = list()
+
+    def download(url, config, logger):
+        fetched.append(url)
+        return SimpleNamespace(status=200, url=url)
+
+    class Scraper:
+        def scraper(self, url, resp):
+            if url != SEED:
+                return []
+            # the other workers find the frontier empty while this page is in flight
+            time.sleep(0.3)
+            workers_alive.extend(worker.is_alive() for worker in pool.workers)
+            return [f'https://www.ics.uci.edu/page{i}' for i in range(3)]
+
+    monkeypatch.setattr(crawler.worker, 'download', download)
+    config = make_config()
+    frontier = Frontier(config, True)
+    pool = WorkerPool(config, frontier, Worker, (Scraper(), None))
+    pool.start()
+    pool.join()
+
+    assert workers_alive == [True, True, True]
+    assert sorted(fetched) == sorted([SEED] + [f'https://www.ics.uci.edu/page{i}' for i in range(3)])
+    assert frontier.is_finished()
+    assert frontier.get_in_flight_count() == 0
+    close_frontier(frontier)
+
+
+class FakeFrontier:
+    def __init__(self, active_queues):
+        self.active_queues = active_queues
+
+    def get_active_queue_count(self):
+        return self.active_queues
+
+    def get_in_flight_count(self):
+        return 0
+
+    def is_finished(self):
+        return False
+
+
+class FakeWorker(Thread):
+    def __init__(self, worker_id, config, frontier):
+        self.stopped = Event()
+        self.pool = None
+        super().__init__(daemon=True)
+
+    def run(self):
+        self.stopped.wait()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def test_pool_refills_dead_workers_and_shrinks():
+    config = make_config(threads_count=2, min_threads=1, max_threads=4, time_delay=1)
+    frontier = FakeFrontier(active_queues=2)
+    pool = WorkerPool(config, frontier, FakeWorker)
+    pool.latency = 1
+    pool._fill()
+    assert len(pool.workers) == 2
+    assert all(worker.pool is pool for worker in pool.workers)
+
+    # a worker that died is replaced
+    pool.workers[0].stop()
+    pool.resize()
+    assert len(pool.workers) == 2
+    assert all(worker.is_alive() for worker in pool.workers)
+    assert pool.next_worker_id == 3
+
+    # fewer active queues shrink the pool, one worker at a time
+    frontier.active_queues = 1
+    pool.resize()
+    assert pool.target == 1
+    first, second = pool.workers
+    assert pool.should_retire(first)
+    assert not pool.should_retire(second)
+    first.stop()
+
+    # a dead worker doesn't count towards the target when deciding to retire
+    frontier.active_queues = 2
+    pool.resize()
+    assert len(pool.workers) == 2
+    pool.workers[1].stop()
+    assert not pool.should_retire(pool.workers[0])
+
+    for worker in pool.workers:
+        worker.stop()
@@ -8,6 +8,10 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.min_threads = int(config["LOCAL PROPERTIES"].get("MINTHREADS", self.threads_count))
+        self.max_threads = int(config["LOCAL PROPERTIES"].get("MAXTHREADS", self.threads_count))
+        self.scale_interval = float(config["LOCAL PROPERTIES"].get("SCALEINTERVAL", 5))
+        assert 0 < self.min_threads <= self.max_threads, "MINTHREADS should be at least 1 and at most MAXTHREADS"
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
 
         self.host = config["CONNECTION"]["HOST"]